@@ -10,17 +10,21 @@ Features:
 - Error handling and logging
 - Export options (markdown, JSON)
 - Progress tracking for large databases
+- Concurrent exploration of collections and subcollections
+- Documents sharing a schema are listed once per collection
 """
 
 import os
 import sys
 import json
 import time
+import asyncio
 import argparse
 import logging
+import threading
 import concurrent.futures
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskID
@@ -28,11 +32,20 @@ from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.logging import RichHandler
 from dotenv import load_dotenv
+from google.auth import load_credentials_from_file
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
 from google.api_core.exceptions import (
     PermissionDenied,
 )
 
+# orjson is an optional extra that speeds up JSON export
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
 # Configure rich console
 console = Console()
 
@@ -41,10 +54,21 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(message)s",
     datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True, console=console)],
+    handlers=[RichHandler(rich_tracebacks=True, show_path=False, console=console)],
 )
 logger = logging.getLogger("firestore_schema")
 
+# Whether the .env file has already been loaded into the environment
+_DOTENV_LOADED = False
+
+
+def _ensure_dotenv():
+    """Load environment variables from .env once per process."""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        load_dotenv()
+        _DOTENV_LOADED = True
+
 
 class TimeoutError(Exception):
     """Custom exception for operation timeouts."""
@@ -52,6 +76,17 @@ class TimeoutError(Exception):
     pass
 
 
+def _positive_int(value: str) -> int:
+    """Parse a command-line value that must be a positive integer."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 class FirestoreSchemaExplorer:
     """Explore and document Firestore database schema."""
 
@@ -65,10 +100,26 @@ class FirestoreSchemaExplorer:
         list: "array",
         type(None): "null",
         datetime: "timestamp",
+        DatetimeWithNanoseconds: "timestamp",
         firestore.GeoPoint: "geopoint",
         bytes: "bytes",
     }
 
+    # Samples larger than this are fetched in pages using query cursors
+    SAMPLE_PAGE_SIZE = 100
+
+    # Subcollection IDs requested per page when listing a document's
+    # subcollections, instead of the backend's small default page size
+    SUBCOLLECTION_PAGE_SIZE = 1000
+
+    # With share_subcollections, sampled documents that must report the same
+    # subcollections before their siblings stop listing their own
+    SUBCOLLECTION_CONFIRMATIONS = 3
+
+    # Write buffer for exported files, so streamed lines reach the disk in
+    # large chunks rather than one small write per few lines
+    EXPORT_BUFFER_SIZE = 1 << 20
+
     def __init__(
         self,
         project_id: Optional[str] = None,
@@ -79,6 +130,8 @@ class FirestoreSchemaExplorer:
         sample_arrays: bool = True,
         array_sample_size: int = 3,
         timeout: int = 30,  # Default timeout in seconds
+        max_concurrency: int = 40,
+        share_subcollections: bool = False,
     ):
         """Initialize the FirestoreSchemaExplorer.
 
@@ -90,13 +143,28 @@ class FirestoreSchemaExplorer:
             include_stats: Include statistics like document counts
             sample_arrays: Sample array contents to determine element types
             array_sample_size: Number of array elements to sample
+            timeout: Timeout in seconds for individual Firestore operations
+            max_concurrency: Maximum number of concurrent Firestore reads
+            share_subcollections: Stop listing subcollections in a collection
+                once SUBCOLLECTION_CONFIRMATIONS sampled documents in a row
+                report the same ones, and reuse them for the remaining siblings
+
+        Raises:
+            ValueError: If max_concurrency is less than 1
         """
+        if max_concurrency < 1:
+            raise ValueError(
+                f"max_concurrency must be at least 1, got {max_concurrency}"
+            )
+
         self.max_docs = max_docs
         self.max_depth = max_depth
         self.include_stats = include_stats
         self.sample_arrays = sample_arrays
         self.array_sample_size = array_sample_size
         self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.share_subcollections = share_subcollections
         self.stats = {
             "collections": 0,
             "documents": 0,
@@ -109,15 +177,66 @@ class FirestoreSchemaExplorer:
         self._progress = None
         self._main_task_id = None
         self._collection_tree = {}
+        self._schema_tree: Dict[str, Dict[str, Any]] = {}
+        self._explored = False
+        self._subcol_cache: Dict[str, Tuple[List[str], int]] = {}
+        self._subcol_locks: Dict[str, threading.Lock] = {}
+        self._type_cache: Dict[Any, str] = {}
+
+        # Types whose description depends on the value itself
+        self._describe_dispatch = {
+            list: self._describe_array,
+            firestore.DocumentReference: self._describe_reference,
+            firestore.AsyncDocumentReference: self._describe_reference,
+        }
+
+        # Indentation strings for every nesting level we expect to render;
+        # deeper map nesting falls back to building the string
+        self._indents = tuple("  " * i for i in range(max_depth * 4 + 8))
+
+        # Shared worker pool for fanning out collection traversal. The lock
+        # guards stats and the processed-path set, and the semaphore caps
+        # the number of Firestore RPCs in flight at any one time.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="firestore-schema"
+        )
+        self._lock = threading.Lock()
+        self._rpc_slots = threading.BoundedSemaphore(max_concurrency)
+
+        # Firestore RPCs run on their own pool so a timed-out call can be
+        # abandoned without blocking, and without creating a thread per call
+        self._rpc_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="firestore-rpc"
+        )
 
         # Initialize Firestore client
         self._init_firestore_client(project_id, credentials_path)
 
+    def close(self):
+        """Shut down the explorer's worker pools.
+
+        RPCs abandoned after a timeout are not waited for; queued work that
+        has not started yet is cancelled.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._rpc_executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "FirestoreSchemaExplorer":
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
     def _run_with_timeout(
         self, func, *args, **kwargs
     ) -> Tuple[Any, bool, Optional[Exception]]:
         """Run a function with a timeout.
 
+        The timeout covers both waiting for a free RPC slot and the call
+        itself. A call that times out is abandoned, not cancelled: it keeps
+        its worker thread and RPC slot until it returns, so calls that hang
+        for good permanently reduce the concurrency available to later ones.
+
         Args:
             func: The function to run
             *args: Arguments to pass to the function
@@ -129,31 +248,73 @@ class FirestoreSchemaExplorer:
             - timed_out: Boolean indicating whether the operation timed out
             - exception: Exception raised by the function, if any
         """
-        # Use ThreadPoolExecutor for timeout management
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(func, *args, **kwargs)
-            try:
-                result = future.result(timeout=self.timeout)
-                return result, False, None
-            except concurrent.futures.TimeoutError:
-                self.stats["timeouts"] += 1
-                logger.warning(f"Operation timed out after {self.timeout} seconds")
-                return (
-                    None,
-                    True,
-                    TimeoutError(f"Operation timed out after {self.timeout} seconds"),
-                )
-            except Exception as e:
-                self.stats["errors"] += 1
-                logger.warning(f"Operation failed: {str(e)}")
-                return None, False, e
+        deadline = time.monotonic() + self.timeout
+
+        # Wait for a free RPC slot so we never flood Firestore with requests
+        if not self._rpc_slots.acquire(timeout=self.timeout):
+            self._incr_stat("timeouts")
+            logger.warning("Operation timed out after %s seconds", self.timeout)
+            return (
+                None,
+                True,
+                TimeoutError(f"Operation timed out after {self.timeout} seconds"),
+            )
+
+        # Run on the shared RPC pool for timeout management; a pool that has
+        # been shut down refuses the call, which must give the slot back
+        try:
+            future = self._rpc_executor.submit(func, *args, **kwargs)
+        except Exception as e:
+            self._rpc_slots.release()
+            self._incr_stat("errors")
+            logger.warning("Operation failed: %s", e)
+            return None, False, e
+        # Release the slot when the call finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._rpc_slots.release())
+        try:
+            # Time spent waiting for the slot comes out of the call's budget
+            result = future.result(timeout=max(0, deadline - time.monotonic()))
+            return result, False, None
+        except concurrent.futures.TimeoutError:
+            self._incr_stat("timeouts")
+            logger.warning("Operation timed out after %s seconds", self.timeout)
+            return (
+                None,
+                True,
+                TimeoutError(f"Operation timed out after {self.timeout} seconds"),
+            )
+        except Exception as e:
+            self._incr_stat("errors")
+            logger.warning("Operation failed: %s", e)
+            return None, False, e
+
+    def _incr_stat(self, key: str, amount: int = 1):
+        """Thread-safely increment one of the exploration counters."""
+        with self._lock:
+            self.stats[key] += amount
+
+    def _submit(self, func, *args) -> Tuple[concurrent.futures.Future, Any, tuple]:
+        """Submit a call to the shared executor, returning a handle for _result.
+
+        Calls whose futures have not started by the time _result waits on
+        them are cancelled and run inline instead, so nested fan-out from
+        worker threads can never deadlock the bounded pool.
+        """
+        return self._executor.submit(func, *args), func, args
+
+    def _result(self, handle: Tuple[concurrent.futures.Future, Any, tuple]) -> Any:
+        """Wait for a submitted call, running it inline if it has not started."""
+        future, func, args = handle
+        if future.cancel():
+            return func(*args)
+        return future.result()
 
     def _init_firestore_client(
         self, project_id: Optional[str], credentials_path: Optional[str]
     ):
         """Initialize the Firestore client with proper error handling."""
         # Load environment variables
-        load_dotenv()
+        _ensure_dotenv()
 
         # Use provided credentials path or get from environment
         cred_path = credentials_path or os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
@@ -163,69 +324,127 @@ class FirestoreSchemaExplorer:
             cred_path = Path(cred_path).expanduser().resolve()
             if not cred_path.is_file():
                 raise FileNotFoundError(f"Credentials file not found: {cred_path}")
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(cred_path)
-            logger.info(f"Using credentials from: {cred_path}")
+            logger.info("Using credentials from: %s", cred_path)
 
         try:
             # Initialize client with optional project_id
             client_kwargs = {}
+            if cred_path:
+                # Hand the validated file to the client ourselves, whether it
+                # came from the argument or the environment, so the library
+                # never re-reads the raw (possibly ~-relative) env value
+                credentials, file_project = load_credentials_from_file(str(cred_path))
+                client_kwargs["credentials"] = credentials
+                if file_project:
+                    client_kwargs["project"] = file_project
             if project_id:
                 client_kwargs["project"] = project_id
             self.db = firestore.Client(**client_kwargs)
-            logger.info(f"Connected to Firestore in project: {self.db.project}")
+            logger.info("Connected to Firestore in project: %s", self.db.project)
         except Exception as e:
-            logger.error(f"Failed to initialize Firestore client: {e}")
+            logger.error("Failed to initialize Firestore client: %s", e)
             raise
 
     def indent(self, level: int) -> str:
         """Return an indentation string based on the nesting level."""
+        if level < len(self._indents):
+            return self._indents[level]
         return "  " * level
 
     def describe_type(self, value: Any) -> str:
         """Get the descriptive type name of a value."""
-        # Handle None explicitly
-        if value is None:
-            return "null"
-
-        # Check for Firestore specific types
+        # Most types describe the same way for every value, so reuse earlier answers
+        value_type = type(value)
+        cached = self._type_cache.get(value_type)
+        if cached is not None:
+            return cached
+
+        handler = self._describe_dispatch.get(value_type)
+        if handler is not None:
+            return handler(value)
+
+        # Known Python and Firestore types map straight to a name
+        type_name = self.TYPE_MAPPING.get(value_type)
+        if type_name is not None:
+            return self._cache_type(value_type, type_name)
+
+        # References include their target path, so they can't be cached by
+        # type; route later values of this type straight to the reference
+        # handler instead
+        if isinstance(value, BaseDocumentReference):
+            self._describe_dispatch[value_type] = self._describe_reference
+            return self._describe_reference(value)
+
+        # Subclasses of the known timestamp and geopoint types
+        if isinstance(value, datetime):
+            return self._cache_type(value_type, "timestamp")
+        if isinstance(value, firestore.GeoPoint):
+            return self._cache_type(value_type, "geopoint")
+
+        # Duck-type anything else that looks like a Firestore value
         if hasattr(value, "timestamp"):
-            return "timestamp"
+            return self._cache_type(value_type, "timestamp")
         elif hasattr(value, "longitude") and hasattr(value, "latitude"):
-            return "geopoint"
+            return self._cache_type(value_type, "geopoint")
         elif hasattr(value, "path"):
-            return f"reference→{value.path}"
-
-        # Basic Python types
-        value_type = type(value)
-        if value_type in self.TYPE_MAPPING:
-            base_type = self.TYPE_MAPPING[value_type]
-
-            # Special handling for collections
-            if isinstance(value, list):
-                if not value or len(value) == 0:
-                    return "array<?>"
-
-                # Sample array elements to detect type
-                if self.sample_arrays:
-                    sample_size = min(len(value), self.array_sample_size)
-                    element_types = set()
-                    for i in range(sample_size):
-                        element_types.add(self.describe_type(value[i]))
-
-                    if len(element_types) == 1:
-                        return f"array<{next(iter(element_types))}>"
-                    else:
-                        return f"array<mixed:{','.join(sorted(element_types))}>"
-                else:
-                    return f"array<{self.describe_type(value[0])}>"
-
-            return base_type
+            return self._describe_reference(value)
 
         # Fallback for unknown types
-        return value_type.__name__
+        return self._cache_type(value_type, value_type.__name__)
+
+    def _cache_type(self, key: Any, type_name: str) -> str:
+        """Remember a type description and return it."""
+        self._type_cache[key] = type_name
+        return type_name
+
+    def _describe_reference(self, value: Any) -> str:
+        """Describe a document reference by the path it points to."""
+        return f"reference→{value.path}"
+
+    def _describe_array(self, value: list) -> str:
+        """Describe an array by sampling the types of its elements."""
+        if not value:
+            return "array<?>"
+
+        # Sample array elements to detect type
+        if self.sample_arrays:
+            sample = value[: self.array_sample_size]
+        else:
+            sample = value[:1]
+
+        key = (list, *map(type, sample))
+        cached = self._type_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Describe each distinct element type once; only value-dependent
+        # types such as references need every element described
+        element_types = set()
+        described = set()
+        for element in sample:
+            element_class = type(element)
+            if element_class in described:
+                continue
+            element_types.add(self.describe_type(element))
+            if element_class in self._type_cache:
+                described.add(element_class)
+
+        if len(element_types) == 1:
+            type_name = f"array<{next(iter(element_types))}>"
+        else:
+            type_name = f"array<mixed:{','.join(sorted(element_types))}>"
+
+        # Only arrays of value-independent element types share a description
+        if all(type(element) in self._type_cache for element in sample):
+            self._type_cache[key] = type_name
+        return type_name
 
     def describe_fields(
-        self, data: Dict[str, Any], level: int, output_lines: List[str]
+        self,
+        data: Dict[str, Any],
+        level: int,
+        output_lines: List[str],
+        fields: Optional[List[Dict[str, Any]]] = None,
     ):
         """Recursively describe fields of a document.
 
@@ -233,17 +452,81 @@ class FirestoreSchemaExplorer:
             data: Document data dictionary
             level: Current nesting level
             output_lines: List to append output lines to
+            fields: Optional list to append structured field entries to
         """
-        for key, value in sorted(data.items()):
-            field_type = self.describe_type(value)
-            # For proper markdown bullets, indent with 2 spaces per level
-            indent = " " * (2 * level)
+        self._describe_signature(
+            self._schema_signature(data), level, output_lines, fields
+        )
+
+    def _describe_signature(
+        self,
+        signature: tuple,
+        level: int,
+        output_lines: List[str],
+        fields: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """Describe fields from a signature built by _schema_signature.
+
+        The signature already holds the sorted field names and their types,
+        so nothing is sorted or described a second time.
+
+        Args:
+            signature: Schema signature of a document or map
+            level: Current nesting level
+            output_lines: List to append output lines to
+            fields: Optional list to append structured field entries to
+        """
+        self._incr_stat("fields", len(signature))
+        # For proper markdown bullets, indent with 2 spaces per level
+        indent = self.indent(level)
+        for key, field_type, nested in signature:
             output_lines.append(f"{indent}- `{key}` ({field_type})")
-            self.stats["fields"] += 1
+
+            nested_fields = None
+            if fields is not None:
+                field = {"name": key, "type": field_type}
+                if nested is not None:
+                    nested_fields = field["fields"] = []
+                fields.append(field)
 
             # Recurse into maps/dictionaries
-            if isinstance(value, dict):
-                self.describe_fields(value, level + 1, output_lines)
+            if nested is not None:
+                self._describe_signature(
+                    nested, level + 1, output_lines, nested_fields
+                )
+
+    def _schema_signature(self, data: Dict[str, Any]) -> tuple:
+        """Build a hashable signature of a document's field names and types.
+
+        Two documents with the same signature are described identically by
+        describe_fields.
+
+        Args:
+            data: Document data dictionary
+
+        Returns:
+            Tuple of (field name, type, nested signature or None) entries
+        """
+        # Fields are listed alphabetically so output is stable between runs.
+        # Sorting bare keys compares strings directly rather than item tuples
+        signature = []
+        for key in sorted(data):
+            value = data[key]
+            signature.append(
+                (
+                    key,
+                    self.describe_type(value),
+                    self._schema_signature(value) if isinstance(value, dict) else None,
+                )
+            )
+        return tuple(signature)
+
+    def _signature_field_count(self, signature: tuple) -> int:
+        """Count the fields in a signature, including those of nested maps."""
+        return sum(
+            1 + (self._signature_field_count(nested) if nested else 0)
+            for _, _, nested in signature
+        )
 
     def _safe_stream_collection(self, collection, limit=None) -> List[Any]:
         """Safely stream a collection with timeout handling.
@@ -255,9 +538,58 @@ class FirestoreSchemaExplorer:
         Returns:
             List of documents or empty list on error/timeout
         """
+        # Large samples are fetched a page at a time
+        if limit is not None and limit > self.SAMPLE_PAGE_SIZE:
+            return self._stream_pages(collection, limit)
+
         # Apply limit if specified
         query = collection.limit(limit) if limit is not None else collection
+        return self._safe_stream_query(collection, query)
+
+    def _stream_pages(self, collection, limit: int) -> List[Any]:
+        """Stream up to limit documents from a collection using query cursors.
+
+        Each page is a separate read with its own timeout, so a slow page
+        keeps the documents already fetched instead of losing the whole sample.
+
+        Args:
+            collection: The collection reference to stream
+            limit: Maximum number of documents to return
+
+        Returns:
+            List of documents fetched before the limit, the end of the
+            collection, or an error/timeout was reached
+        """
+        query = collection.order_by("__name__")
+        # Queries are immutable builders, so the full-page query is built once
+        # and only the cursor changes from page to page
+        full_page = query.limit(self.SAMPLE_PAGE_SIZE)
+        docs = []
+        while len(docs) < limit:
+            page_size = min(self.SAMPLE_PAGE_SIZE, limit - len(docs))
+            if page_size == self.SAMPLE_PAGE_SIZE:
+                page_query = full_page
+            else:
+                page_query = query.limit(page_size)
+            if docs:
+                page_query = page_query.start_after(docs[-1])
+
+            page = self._safe_stream_query(collection, page_query)
+            docs.extend(page)
+            if len(page) < page_size:
+                break
+        return docs
 
+    def _safe_stream_query(self, collection, query) -> List[Any]:
+        """Safely stream a query over a collection with timeout handling.
+
+        Args:
+            collection: The collection reference the query reads from
+            query: The query to stream
+
+        Returns:
+            List of documents or empty list on error/timeout
+        """
         # Define the streaming function
         def stream_docs():
             return list(query.stream())
@@ -266,17 +598,31 @@ class FirestoreSchemaExplorer:
         docs, timed_out, error = self._run_with_timeout(stream_docs)
 
         if timed_out:
-            logger.warning(f"Streaming collection {collection.id} timed out")
+            logger.warning("Streaming collection %s timed out", collection.id)
             return []
 
         if error:
-            logger.warning(f"Error streaming collection {collection.id}: {error}")
+            logger.warning("Error streaming collection %s: %s", collection.id, error)
             if isinstance(error, PermissionDenied):
                 raise error  # Re-raise permission errors for special handling
             return []
 
         return docs or []
 
+    def _count_documents(self, collection) -> int:
+        """Count the documents in a collection.
+
+        Uses a server-side count() aggregation, so the count is exact and only
+        a single number crosses the wire.
+
+        Args:
+            collection: The collection reference to count
+
+        Returns:
+            Number of documents in the collection
+        """
+        return collection.count().get()[0][0].value
+
     def process_collection(
         self, path: str, level: int = 0, parent_task_id: Optional[TaskID] = None
     ) -> List[str]:
@@ -291,15 +637,18 @@ class FirestoreSchemaExplorer:
             List of output lines
         """
         # Guard against cycles and excessive recursion
-        if path in self._processed_paths or level >= self.max_depth:
+        if level >= self.max_depth:
             return []
+        with self._lock:
+            if path in self._processed_paths:
+                return []
+            self._processed_paths.add(path)
 
-        self._processed_paths.add(path)
         output_lines = []
 
         try:
             collection = self.db.collection(path)
-            self.stats["collections"] += 1
+            self._incr_stat("collections")
 
             # Create progress task for this collection
             task_description = f"Collection: {path}"
@@ -309,28 +658,30 @@ class FirestoreSchemaExplorer:
                     task_description, total=self.max_docs, parent=parent_task_id
                 )
 
+            # Start sampling documents while the count is being fetched, so
+            # the two reads overlap instead of running back to back
+            sample = self._submit(
+                self._safe_stream_collection, collection, self.max_docs
+            )
+
             # Get collection stats if requested
             doc_count = None
             if self.include_stats:
                 try:
-                    # Efficiently count documents (limited to 1000 for performance)
-                    query = collection.limit(1000)
-                    docs, timed_out, error = self._run_with_timeout(
-                        lambda: list(query.stream())
+                    counted, timed_out, error = self._run_with_timeout(
+                        self._count_documents, collection
                     )
 
                     if timed_out:
                         doc_count_str = "unknown (timed out)"
                     elif error:
-                        logger.warning(f"Failed to count documents in {path}: {error}")
+                        logger.warning("Failed to count documents in %s: %s", path, error)
                         doc_count_str = "unknown (error)"
                     else:
-                        doc_count = len(docs)
-                        doc_count_str = (
-                            f"{doc_count}+" if doc_count >= 1000 else str(doc_count)
-                        )
+                        doc_count = counted
+                        doc_count_str = str(doc_count)
                 except Exception as e:
-                    logger.warning(f"Failed to count documents in {path}: {e}")
+                    logger.warning("Failed to count documents in %s: %s", path, e)
                     doc_count_str = "unknown"
 
             # Track in collection tree
@@ -340,6 +691,10 @@ class FirestoreSchemaExplorer:
                 'doc_count_str': doc_count_str if doc_count is not None else "unknown"
             }
 
+            # Track the structured schema used for JSON export
+            schema_documents = {}
+            self._schema_tree[path] = {"documents": schema_documents}
+
             # Add collection header
             collection_header = f"### Collection: `{path}`"
             if doc_count is not None:
@@ -349,7 +704,7 @@ class FirestoreSchemaExplorer:
             # Sample documents
             try:
                 try:
-                    docs = self._safe_stream_collection(collection, self.max_docs)
+                    docs = self._result(sample)
                 except PermissionDenied:
                     # Handle permission denied error
                     output_lines.append(
@@ -361,64 +716,160 @@ class FirestoreSchemaExplorer:
                     output_lines.append("*No documents found*")
                     return output_lines
 
-                # Process each document
-                for i, doc in enumerate(docs):
-                    if self._progress and collection_task_id:
-                        self._progress.update(collection_task_id, completed=i + 1)
-
+                # Describe each document, starting its subcollection walk
+                # right away so the listing RPCs overlap describing the rest
+                # of the sample and sibling documents are explored concurrently
+                walk_subcollections = level < self.max_depth - 1
+                doc_sections = []
+                subcollection_walks = []
+                seen_schemas = {}
+                for doc in docs:
                     doc_data = doc.to_dict()
                     if not doc_data:
                         continue
 
-                    self.stats["documents"] += 1
-                    output_lines.append(f"#### Document: `{doc.id}`")
-                    self.describe_fields(doc_data, level + 2, output_lines)
+                    doc_lines = [f"#### Document: `{doc.id}`"]
 
-                    # Process subcollections if not at max depth
-                    if level < self.max_depth - 1:
-                        # Get subcollections with timeout handling
-                        subcollections, timed_out, error = self._run_with_timeout(
-                            lambda: list(doc.reference.collections())
+                    # Documents shaped like an earlier sample would describe
+                    # identically, so point back to it instead; their fields
+                    # still count towards the fields analyzed
+                    signature = self._schema_signature(doc_data)
+                    if signature in seen_schemas:
+                        first_id, doc_fields, field_count = seen_schemas[signature]
+                        doc_lines.append(f"*Same schema as `{first_id}`*")
+                        self._incr_stat("fields", field_count)
+                    else:
+                        doc_fields = []
+                        self._describe_signature(
+                            signature, level + 2, doc_lines, doc_fields
                         )
+                        seen_schemas[signature] = (
+                            doc.id,
+                            doc_fields,
+                            self._signature_field_count(signature),
+                        )
+                    schema_documents[doc.id] = {"fields": doc_fields}
+                    doc_sections.append(doc_lines)
 
-                        if timed_out:
-                            output_lines.append(
-                                "*Timed out when fetching subcollections*"
-                            )
-                            continue
-
-                        if error:
-                            output_lines.append(
-                                f"*Error fetching subcollections: {error}*"
+                    # Process subcollections if not at max depth
+                    if walk_subcollections:
+                        subcollection_walks.append(
+                            self._submit(
+                                self._process_subcollections,
+                                path,
+                                doc,
+                                level,
+                                collection_task_id,
                             )
-                            continue
+                        )
 
-                        for subcol in subcollections or []:
-                            # Construct the full subcollection path
-                            subcol_path = f"{doc.reference.path}/{subcol.id}"
-                            subcol_output = self.process_collection(
-                                subcol_path, level + 2, collection_task_id
-                            )
-                            output_lines.extend(subcol_output)
+                # Describing the sample is quick, so stats and progress are
+                # updated once per collection rather than once per document
+                self._incr_stat("documents", len(doc_sections))
+                if self._progress and collection_task_id:
+                    self._progress.update(collection_task_id, completed=len(docs))
+
+                # Subcollection output follows its parent document's fields;
+                # both are copied straight into the collection's output
+                if walk_subcollections:
+                    subcollection_outputs = [
+                        self._result(walk) for walk in subcollection_walks
+                    ]
+                else:
+                    subcollection_outputs = [[]] * len(doc_sections)
+                for doc_lines, subcol_lines in zip(
+                    doc_sections, subcollection_outputs
+                ):
+                    output_lines.extend(doc_lines)
+                    output_lines.extend(subcol_lines)
 
             except PermissionDenied:
                 output_lines.append("*Permission denied when accessing documents*")
             except TimeoutError as e:
                 output_lines.append(f"*Timed out when accessing documents: {str(e)}*")
-                logger.warning(f"Timeout processing documents in {path}: {e}")
+                logger.warning("Timeout processing documents in %s: %s", path, e)
             except Exception as e:
                 output_lines.append(f"*Error accessing documents: {str(e)}*")
-                logger.error(f"Error processing documents in {path}: {e}")
-                self.stats["errors"] += 1
+                logger.error("Error processing documents in %s: %s", path, e)
+                self._incr_stat("errors")
 
         except TimeoutError as e:
             output_lines.append(f"### `{path}`: *Timeout: {str(e)}*")
-            logger.warning(f"Timeout processing collection {path}: {e}")
+            logger.warning("Timeout processing collection %s: %s", path, e)
         except Exception as e:
             output_lines.append(f"### `{path}`: *Error: {str(e)}*")
-            logger.error(f"Error processing collection {path}: {e}")
-            self.stats["errors"] += 1
+            logger.error("Error processing collection %s: %s", path, e)
+            self._incr_stat("errors")
+
+        return output_lines
+
+    def _list_subcollection_ids(self, doc) -> Tuple[List[str], Optional[str]]:
+        """List the IDs of a document's subcollections.
+
+        Args:
+            doc: Document snapshot whose subcollections should be listed
+
+        Returns:
+            Tuple of (subcollection IDs, output line describing a failure or None)
+        """
+        # Get subcollections with timeout handling
+        subcollections, timed_out, error = self._run_with_timeout(
+            lambda: list(
+                doc.reference.collections(page_size=self.SUBCOLLECTION_PAGE_SIZE)
+            )
+        )
+
+        if timed_out:
+            return [], "*Timed out when fetching subcollections*"
+
+        if error:
+            return [], f"*Error fetching subcollections: {error}*"
+
+        return [subcol.id for subcol in subcollections or []], None
+
+    def _process_subcollections(
+        self, path: str, doc, level: int, parent_task_id: Optional[TaskID] = None
+    ) -> List[str]:
+        """List and process the subcollections of a document.
+
+        Args:
+            path: Path of the collection containing the document
+            doc: Document snapshot whose subcollections should be explored
+            level: Nesting level of the document's parent collection
+            parent_task_id: Parent progress task ID
+
+        Returns:
+            List of output lines
+        """
+        if self.share_subcollections:
+            # Siblings list one at a time until enough of them agree, then
+            # reuse the agreed listing instead of making their own
+            with self._lock:
+                path_lock = self._subcol_locks.setdefault(path, threading.Lock())
+            with path_lock:
+                shared = self._subcol_cache.get(path)
+                if shared is not None and shared[1] >= self.SUBCOLLECTION_CONFIRMATIONS:
+                    subcol_ids = shared[0]
+                else:
+                    subcol_ids, error_line = self._list_subcollection_ids(doc)
+                    if error_line:
+                        return [error_line]
+                    agreeing = 1
+                    if shared is not None and shared[0] == subcol_ids:
+                        agreeing = shared[1] + 1
+                    self._subcol_cache[path] = (subcol_ids, agreeing)
+        else:
+            subcol_ids, error_line = self._list_subcollection_ids(doc)
+            if error_line:
+                return [error_line]
 
+        output_lines = []
+        for subcol_id in subcol_ids:
+            # Construct the full subcollection path
+            subcol_path = f"{doc.reference.path}/{subcol_id}"
+            output_lines.extend(
+                self.process_collection(subcol_path, level + 2, parent_task_id)
+            )
         return output_lines
 
     def generate_ascii_tree(self) -> str:
@@ -489,9 +940,48 @@ class FirestoreSchemaExplorer:
         Returns:
             Markdown string containing the schema documentation
         """
-        output = ["# 🔥 Firestore Schema Explorer"]
-        output.append(f"\nGenerated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        output.append(f"Project: `{self.db.project}`\n")
+        return "\n".join(self.iter_schema())
+
+    async def aexplore_database(self) -> str:
+        """Explore the entire Firestore database from async code.
+
+        The traversal runs on a worker thread, where its reads are fanned out
+        over the explorer's thread pool, so the event loop stays free.
+
+        Returns:
+            Markdown string containing the schema documentation
+        """
+        return await asyncio.to_thread(self.explore_database)
+
+    def iter_schema(self) -> Iterator[str]:
+        """Explore the entire Firestore database, yielding markdown lines.
+
+        Exploration finishes before the first line is yielded, since the
+        structure overview at the top needs every collection. Collection
+        sections are then yielded one by one instead of being joined into a
+        single document.
+
+        Yields:
+            Lines of the schema documentation
+        """
+        header, sections, footer = self._explore()
+        yield from header
+        for section in sections:
+            yield from section
+        yield from footer
+
+    def _explore(self) -> Tuple[List[str], List[List[str]], List[str]]:
+        """Run the database exploration.
+
+        Returns:
+            Tuple of (header lines, per-collection sections, footer lines)
+        """
+        self._explored = True
+        header = ["# 🔥 Firestore Schema Explorer"]
+        header.append(f"\nGenerated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        header.append(f"Project: `{self.db.project}`\n")
+        sections = []
+        footer = []
 
         try:
             # Use rich progress display
@@ -515,34 +1005,44 @@ class FirestoreSchemaExplorer:
                     )
 
                     if timed_out:
-                        output.append("*Timed out while listing collections.*")
-                        return "\n".join(output)
+                        footer.append("*Timed out while listing collections.*")
+                        return header, sections, footer
 
                     if error:
-                        output.append(f"*Error listing collections: {str(error)}*")
-                        logger.error(f"Failed to list collections: {error}")
-                        return "\n".join(output)
+                        footer.append(f"*Error listing collections: {str(error)}*")
+                        logger.error("Failed to list collections: %s", error)
+                        return header, sections, footer
 
                     if not collections:
-                        output.append("*No collections found in the database.*")
-                        return "\n".join(output)
+                        footer.append("*No collections found in the database.*")
+                        return header, sections, footer
 
                     progress.update(self._main_task_id, total=len(collections))
 
-                    # Process each collection
-                    for i, col in enumerate(collections):
+                    # Process collections concurrently, keyed by index so the
+                    # header keeps the order Firestore listed them in
+                    futures = {
+                        self._executor.submit(
+                            self.process_collection,
+                            col.id,
+                            parent_task_id=self._main_task_id,
+                        ): i
+                        for i, col in enumerate(collections)
+                    }
+                    collection_outputs = [None] * len(collections)
+                    for completed, future in enumerate(
+                        concurrent.futures.as_completed(futures), start=1
+                    ):
+                        i = futures[future]
+                        collection_outputs[i] = future.result()
                         progress.update(
                             self._main_task_id,
-                            description=f"Processing collection {i+1}/{len(collections)}: {col.id}",
-                            completed=i,
+                            description=f"Processed collection {completed}/{len(collections)}: {collections[i].id}",
+                            completed=completed,
                         )
-                        collection_output = self.process_collection(
-                            col.id, parent_task_id=self._main_task_id
-                        )
-                        output.extend(collection_output)
 
-                    progress.update(self._main_task_id, completed=len(collections))
-                    
+                    sections = collection_outputs
+
                     # Add ASCII tree overview after exploration
                     tree = self.generate_ascii_tree()
                     if tree:
@@ -551,46 +1051,59 @@ class FirestoreSchemaExplorer:
                         # Find where to insert (after project line)
                         insert_index = 3  # After header, generated date, and project line
                         for i, line in enumerate(tree_lines):
-                            output.insert(insert_index + i, line)
+                            header.insert(insert_index + i, line)
 
                 except TimeoutError as e:
-                    output.append(f"*Timeout listing collections: {str(e)}*")
-                    logger.warning(f"Timeout listing collections: {e}")
-                    self.stats["timeouts"] += 1
+                    footer.append(f"*Timeout listing collections: {str(e)}*")
+                    logger.warning("Timeout listing collections: %s", e)
+                    self._incr_stat("timeouts")
                 except Exception as e:
-                    output.append(f"*Error listing collections: {str(e)}*")
-                    logger.error(f"Failed to list collections: {e}")
-                    self.stats["errors"] += 1
+                    footer.append(f"*Error listing collections: {str(e)}*")
+                    logger.error("Failed to list collections: %s", e)
+                    self._incr_stat("errors")
 
         except TimeoutError as e:
-            output.append(f"*Exploration timeout: {str(e)}*")
-            logger.warning(f"Exploration timeout: {e}")
-            self.stats["timeouts"] += 1
+            footer.append(f"*Exploration timeout: {str(e)}*")
+            logger.warning("Exploration timeout: %s", e)
+            self._incr_stat("timeouts")
         except Exception as e:
-            output.append(f"*Exploration error: {str(e)}*")
-            logger.error(f"Exploration error: {e}")
-            self.stats["errors"] += 1
+            footer.append(f"*Exploration error: {str(e)}*")
+            logger.error("Exploration error: %s", e)
+            self._incr_stat("errors")
 
         # Add statistics
         if self.include_stats:
             self.stats["duration"] = time.time() - self.stats["start_time"]
-            output.append("\n## Statistics")
-            output.append(f"- Collections: {self.stats['collections']}")
-            output.append(f"- Documents sampled: {self.stats['documents']}")
-            output.append(f"- Fields analyzed: {self.stats['fields']}")
-            output.append(f"- Duration: {self.stats['duration']:.2f} seconds")
-            output.append(f"- Timeouts: {self.stats['timeouts']}")
-            output.append(f"- Errors: {self.stats['errors']}")
-
-        return "\n".join(output)
-
-    def export_to_file(self, output: str, filename: str, format: str = "md"):
+            footer.append("\n## Statistics")
+            footer.append(f"- Collections: {self.stats['collections']}")
+            footer.append(f"- Documents sampled: {self.stats['documents']}")
+            footer.append(f"- Fields analyzed: {self.stats['fields']}")
+            footer.append(f"- Duration: {self.stats['duration']:.2f} seconds")
+            footer.append(f"- Timeouts: {self.stats['timeouts']}")
+            footer.append(f"- Errors: {self.stats['errors']}")
+
+        return header, sections, footer
+
+    def export_to_file(
+        self, output: Union[str, Iterable[str]], filename: str, format: str = "md"
+    ):
         """Export the schema documentation to a file.
 
+        The output is written to a temporary file in the same directory and
+        only replaces filename once it is complete.
+
         Args:
-            output: Schema documentation string
+            output: Schema documentation string, or an iterable of its lines
+                such as iter_schema() to write incrementally. Only written for
+                'md'; for 'json' an iterable is just consumed to run the
+                exploration
             filename: Output filename
-            format: Output format ('md' or 'json')
+            format: Output format ('md' or 'json'). JSON is built from the
+                structured schema this explorer collected while exploring,
+                not from output
+
+        Raises:
+            ValueError: If JSON is requested before this explorer has explored
         """
         try:
             output_path = Path(filename)
@@ -598,45 +1111,74 @@ class FirestoreSchemaExplorer:
             # Create parent directories if they don't exist
             output_path.parent.mkdir(parents=True, exist_ok=True)
 
-            if format.lower() == "json":
-                # Convert markdown to a structured JSON format
-                # This is a simplified implementation
-                collections_data = {}
-                current_collection = None
-                current_document = None
-
-                for line in output.split("\n"):
-                    if "### Collection: `" in line:
-                        collection_name = line.split("`")[1]
-                        collections_data[collection_name] = {"documents": {}}
-                        current_collection = collection_name
-                    elif "#### Document: `" in line and current_collection:
-                        doc_id = line.split("`")[1]
-                        collections_data[current_collection]["documents"][doc_id] = {
-                            "fields": []
-                        }
-                        current_document = doc_id
-                    elif "- `" in line and current_collection and current_document:
-                        field_info = line.strip().split("`")[1]
-                        field_type = line.split("(")[1].split(")")[0]
-                        collections_data[current_collection]["documents"][
-                            current_document
-                        ]["fields"].append({"name": field_info, "type": field_type})
-
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(collections_data, f, indent=2)
-            else:
-                # Write markdown directly
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(output)
+            # Write next to the target and move the file into place only once
+            # the output is complete, so a failed or cancelled exploration
+            # leaves any existing schema file untouched
+            temp_path = output_path.with_name(
+                f".{output_path.name}.{os.getpid()}.tmp"
+            )
+            try:
+                self._write_output(output, temp_path, format)
+                os.replace(temp_path, output_path)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
 
-            logger.info(f"Schema exported to {output_path}")
+            logger.info("Schema exported to %s", output_path)
             return str(output_path)
 
         except Exception as e:
-            logger.error(f"Failed to export schema: {e}")
+            logger.error("Failed to export schema: %s", e)
             raise
 
+    def _write_output(
+        self, output: Union[str, Iterable[str]], path: Path, format: str
+    ):
+        """Write the schema documentation to path in the given format."""
+        if format.lower() == "json":
+            if not isinstance(output, str):
+                # Lazily generated output drives the exploration that
+                # fills the schema tree, so it has to be consumed first
+                for _ in output:
+                    pass
+
+            if not self._explored and not self._schema_tree:
+                raise ValueError(
+                    "JSON export needs a schema explored by this explorer; "
+                    "pass iter_schema() or explore the database first"
+                )
+
+            # Dump the structured schema collected during exploration,
+            # sorted by path since collections finish in any order
+            schema = dict(sorted(self._schema_tree.items()))
+            if orjson is not None:
+                with open(path, "wb") as f:
+                    f.write(orjson.dumps(schema, option=orjson.OPT_INDENT_2))
+            else:
+                with open(path, "w", encoding="utf-8", newline="\n") as f:
+                    json.dump(schema, f, indent=2, ensure_ascii=False)
+        elif isinstance(output, str):
+            # A complete document is encoded once and written in one call,
+            # skipping the text layer and its buffer
+            with open(path, "wb") as f:
+                f.write(output.encode("utf-8"))
+        else:
+            # Write markdown line by line as the iterable produces it, with
+            # the same LF line endings as the binary write above on every
+            # platform
+            with open(
+                path,
+                "w",
+                encoding="utf-8",
+                newline="\n",
+                buffering=self.EXPORT_BUFFER_SIZE,
+            ) as f:
+                lines = iter(output)
+                f.write(next(lines, ""))
+                for line in lines:
+                    f.write("\n")
+                    f.write(line)
+
 
 def main():
     """Main entry point for the script."""
@@ -696,6 +1238,23 @@ def main():
         help="Timeout in seconds for Firestore operations",
     )
 
+    parser.add_argument(
+        "--max-concurrency",
+        type=_positive_int,
+        default=40,
+        help="Maximum number of concurrent Firestore reads",
+    )
+
+    parser.add_argument(
+        "--share-subcollections",
+        action="store_true",
+        help=(
+            "Stop listing subcollections once sampled documents in a collection "
+            "agree on them; may miss subcollections only some documents have, "
+            "and may show empty subcollections for documents without them"
+        ),
+    )
+
     parser.add_argument(
         "--verbose", "-v", action="store_true", help="Enable verbose logging"
     )
@@ -715,12 +1274,10 @@ def main():
             max_depth=args.depth,
             include_stats=not args.no_stats,
             timeout=args.timeout,
+            max_concurrency=args.max_concurrency,
+            share_subcollections=args.share_subcollections,
         )
 
-        # Run exploration
-        console.print("🔍 Exploring Firestore schema...", style="bold blue")
-        schema_doc = explorer.explore_database()
-
         # Determine output path
         output_file = args.output
         if output_file is None:
@@ -728,14 +1285,21 @@ def main():
             project_id = explorer.db.project
             output_file = f"{project_id}.schema.md"
 
-        # Export results
-        output_path = explorer.export_to_file(schema_doc, output_file, args.format)
+        # Run exploration, streaming the results to the output file
+        console.print("🔍 Exploring Firestore schema...", style="bold blue")
+        with explorer:
+            output_path = explorer.export_to_file(
+                explorer.iter_schema(), output_file, args.format
+            )
 
         # Show preview in terminal
         console.print("\n[bold green]✅ Schema exploration complete![/]")
         console.print(f"Output saved to: [bold]{output_path}[/]")
 
         if args.format == "md":
+            # Read back only as much of the document as the preview shows
+            with open(output_path, "r", encoding="utf-8") as f:
+                schema_doc = f.read(2001)
             console.print("\n[bold]Schema Preview:[/]")
             console.print(
                 Markdown(
@@ -1,15 +1,48 @@
 # ABOUTME: Provides test fixtures for the Firestore Schema Explorer tests.
 # ABOUTME: Contains mocks for Firestore clients, documents, and collections.
 
+import copy
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from datetime import datetime
 from google.cloud import firestore
-from google.cloud.firestore_v1.base_document import DocumentSnapshot
-from google.cloud.firestore_v1.collection import CollectionReference
 from google.api_core.exceptions import PermissionDenied
 
 
+def pytest_addoption(parser):
+    """Add the --slow option for running expensive tests."""
+    parser.addoption(
+        "--slow", action="store_true", default=False, help="Run tests marked as slow"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip tests marked as slow unless --slow was given."""
+    if config.getoption("--slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow test, run with --slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+def _make_collection(collection_id, docs=(), count=None, stream_side_effect=None):
+    """Build a mock collection whose limited queries stream the given documents."""
+    mock_collection = MagicMock()
+    mock_collection.id = collection_id
+    mock_collection.path = collection_id
+    if stream_side_effect is not None:
+        mock_collection.stream.side_effect = stream_side_effect
+    else:
+        mock_collection.stream.return_value = list(docs)
+    mock_collection.limit.return_value = mock_collection
+    if count is not None:
+        mock_collection.count.return_value.get.return_value = [
+            [MagicMock(value=count)]
+        ]
+    return mock_collection
+
+
 @pytest.fixture
 def mock_firestore_client():
     """Mock Firestore client with basic functionality."""
@@ -18,27 +51,43 @@ def mock_firestore_client():
     return mock_client
 
 
+@pytest.fixture
+def make_explorer():
+    """Build explorers around a mock client, shutting their pools down afterwards."""
+    from main import FirestoreSchemaExplorer
+
+    explorers = []
+
+    def factory(client, **kwargs):
+        with patch("main.firestore.Client", return_value=client):
+            with patch("main.load_dotenv"):
+                explorer = FirestoreSchemaExplorer(**kwargs)
+        # Keep rich progress output out of the tests
+        explorer._progress = None
+        explorers.append(explorer)
+        return explorer
+
+    yield factory
+    for explorer in explorers:
+        explorer.close()
+
+
 @pytest.fixture
 def mock_empty_collection():
     """Mock an empty collection."""
-    mock_collection = MagicMock(spec=CollectionReference)
-    mock_collection.id = "empty_collection"
-    mock_collection.path = "empty_collection"
-    mock_collection.stream.return_value = []
-    mock_collection.limit.return_value = mock_collection
-    return mock_collection
+    return _make_collection("empty_collection", count=0)
 
 
-@pytest.fixture
-def mock_document_data():
-    """Mock document data with various field types."""
+@pytest.fixture(scope="session")
+def _mock_document_data_session():
+    """Mock document data with various field types, built once per test run."""
     return {
         "string_field": "test string",
         "int_field": 42,
         "float_field": 3.14,
         "bool_field": True,
         "null_field": None,
-        "timestamp_field": datetime.now(),
+        "timestamp_field": datetime(2024, 1, 1),
         "array_simple": [1, 2, 3],
         "array_mixed": [1, "string", True],
         "array_empty": [],
@@ -47,10 +96,16 @@ def mock_document_data():
     }
 
 
+@pytest.fixture
+def mock_document_data(_mock_document_data_session):
+    """Mock document data with various field types, safe for tests to mutate."""
+    return copy.deepcopy(_mock_document_data_session)
+
+
 @pytest.fixture
 def mock_document(mock_document_data):
     """Mock a Firestore document with test data."""
-    mock_doc = MagicMock(spec=DocumentSnapshot)
+    mock_doc = MagicMock()
     mock_doc.id = "test_doc_id"
     mock_doc.to_dict.return_value = mock_document_data
 
@@ -64,21 +119,13 @@ def mock_document(mock_document_data):
 @pytest.fixture
 def mock_collection_with_docs(mock_document):
     """Mock a collection with documents."""
-    mock_collection = MagicMock(spec=CollectionReference)
-    mock_collection.id = "test_collection"
-    mock_collection.path = "test_collection"
-    mock_collection.stream.return_value = [mock_document]
-    mock_collection.limit.return_value = mock_collection
-    return mock_collection
+    return _make_collection("test_collection", [mock_document], count=1)
 
 
 @pytest.fixture
 def mock_collection_with_subcollections(mock_document):
     """Mock a collection with documents that have subcollections."""
-    mock_subcollection = MagicMock(spec=CollectionReference)
-    mock_subcollection.id = "subcollection"
-    mock_subcollection.stream.return_value = []
-    mock_subcollection.limit.return_value = mock_subcollection
+    mock_subcollection = _make_collection("subcollection", count=0)
 
     # Set up the document with a subcollection
     mock_doc = mock_document
@@ -86,23 +133,19 @@ def mock_collection_with_subcollections(mock_document):
     mock_doc.reference.collections.return_value = [mock_subcollection]
 
     # Set up the collection
-    mock_collection = MagicMock(spec=CollectionReference)
-    mock_collection.id = "test_collection"
-    mock_collection.path = "test_collection"
-    mock_collection.stream.return_value = [mock_doc]
-    mock_collection.limit.return_value = mock_collection
-
-    return mock_collection
+    return _make_collection("test_collection", [mock_doc], count=1)
 
 
 @pytest.fixture
 def mock_permission_denied_collection():
-    """Mock a collection that raises PermissionDenied when streaming."""
-    mock_collection = MagicMock(spec=CollectionReference)
-    mock_collection.id = "secure_collection"
-    mock_collection.path = "secure_collection"
-    mock_collection.stream.side_effect = PermissionDenied("Permission denied")
-    mock_collection.limit.return_value = mock_collection
+    """Mock a collection that raises PermissionDenied when streaming or counting."""
+    mock_collection = _make_collection(
+        "secure_collection",
+        stream_side_effect=PermissionDenied("Permission denied"),
+    )
+    mock_collection.count.return_value.get.side_effect = PermissionDenied(
+        "Permission denied"
+    )
     return mock_collection
 
 
@@ -123,23 +166,73 @@ def firestore_with_collections(
         mock_permission_denied_collection,
     ]
 
-    # Configure collection method to return the appropriate mock based on the path
+    # Separate mock for the actual subcollection path, built once per test
+    # rather than on every lookup
+    subcol_mock = _make_collection("subcollection", count=0)
+
+    # Configure collection method to return the appropriate mock based on the
+    # path; unknown paths share one fallback mock instead of a new one per call
+    collections_by_path = {
+        "empty_collection": mock_empty_collection,
+        "test_collection": mock_collection_with_subcollections,
+        "test_collection/test_doc_id/subcollection": subcol_mock,
+        "secure_collection": mock_permission_denied_collection,
+    }
+    unknown_collection = MagicMock()
+
     def get_collection(path):
-        if path == "empty_collection":
-            return mock_empty_collection
-        elif path == "test_collection":
-            return mock_collection_with_subcollections
-        elif path == "test_collection/test_doc_id/subcollection":
-            # Return a fresh subcollection mock for the actual subcollection path
-            subcol_mock = MagicMock(spec=CollectionReference)
-            subcol_mock.id = "subcollection"
-            subcol_mock.stream.return_value = []
-            subcol_mock.limit.return_value = subcol_mock
-            return subcol_mock
-        elif path == "secure_collection":
-            return mock_permission_denied_collection
-        return MagicMock()
+        return collections_by_path.get(path, unknown_collection)
 
     mock_firestore_client.collection.side_effect = get_collection
 
     return mock_firestore_client
+
+
+@pytest.fixture(scope="session")
+def _large_mock_client_session():
+    """Mock a Firestore client with 100 collections of 10 documents each.
+
+    The graph is only read by the explorer, so it is built once per session.
+    """
+    mock_client = MagicMock()
+    mock_client.project = "large-project"
+
+    # Create 100 mock collections
+    mock_collections = []
+    for i in range(100):
+        # Each collection has 10 documents without subcollections
+        docs = []
+        for j in range(10):
+            doc = MagicMock()
+            doc.id = f"doc_{j}"
+            doc.to_dict.return_value = {"field": "value"}
+            doc.reference.collections.return_value = []
+            docs.append(doc)
+
+        mock_collections.append(_make_collection(f"collection_{i}", docs, count=10))
+
+    mock_client.collections.return_value = mock_collections
+
+    # Create a function to return collections by name
+    collections_by_id = {col.id: col for col in mock_collections}
+
+    def get_collection(name):
+        return collections_by_id.get(name) or MagicMock()
+
+    mock_client.collection.side_effect = get_collection
+
+    return mock_client
+
+
+@pytest.fixture
+def large_mock_client(_large_mock_client_session):
+    """Shared large mock client, with recorded calls cleared after each test."""
+    yield _large_mock_client_session
+
+    # Keep the configured return values but drop the calls this test made,
+    # so nothing recorded leaks into the next test that uses the graph
+    _large_mock_client_session.reset_mock()
+    for collection in _large_mock_client_session.collections.return_value:
+        collection.reset_mock()
+        for doc in collection.stream.return_value:
+            doc.reset_mock()
@@ -1,29 +1,18 @@
 # ABOUTME: Tests the collection processing functionality.
 # ABOUTME: Validates handling of collections, documents, and subcollections.
 
+import threading
 import pytest
-from unittest.mock import patch
-from pathlib import Path
-
-import sys
-
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
-from main import FirestoreSchemaExplorer
+from unittest.mock import MagicMock, patch
 
 
 class TestCollectionProcessing:
     """Test the collection processing functionality."""
 
     @pytest.fixture
-    def explorer(self, firestore_with_collections):
+    def explorer(self, make_explorer, firestore_with_collections):
         """Create a FirestoreSchemaExplorer instance with mock collections."""
-        with patch("main.firestore.Client", return_value=firestore_with_collections):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(max_depth=3)
-                # Clear progress indicators for testing
-                explorer._progress = None
-                return explorer
+        return make_explorer(firestore_with_collections, max_depth=3)
 
     def test_empty_collection(self, explorer):
         """Test processing of an empty collection."""
@@ -115,3 +104,163 @@ class TestCollectionProcessing:
         assert output == []
         assert explorer.stats["collections"] == 0
         assert explorer.stats["documents"] == 0
+
+    def test_document_count_uses_aggregation(self, explorer):
+        """Test that document counts come from a count() aggregation query."""
+        output = explorer.process_collection("test_collection")
+
+        assert "### Collection: `test_collection` (1 documents)" in output[0]
+        collection = explorer.db.collection("test_collection")
+        collection.count.assert_called_once()
+        collection.limit.assert_called_once_with(explorer.max_docs)
+
+    def test_count_and_sample_overlap(self, explorer):
+        """Test that counting and sampling a collection run concurrently."""
+        collection = explorer.db.collection("test_collection")
+        sampled = threading.Event()
+        overlapped = []
+
+        def stream():
+            sampled.set()
+            return []
+
+        def count():
+            # Only returns promptly if sampling started while we wait
+            overlapped.append(sampled.wait(timeout=2))
+            return [[MagicMock(value=1)]]
+
+        collection.stream.side_effect = stream
+        collection.count.return_value.get.side_effect = count
+
+        explorer.process_collection("test_collection")
+
+        assert overlapped == [True]
+
+    def test_share_subcollections(self, explorer):
+        """Test that sibling documents reuse the first document's subcollections."""
+        explorer.share_subcollections = True
+        explorer.SUBCOLLECTION_CONFIRMATIONS = 1
+        collection = explorer.db.collection("test_collection")
+        first_doc = collection.stream.return_value[0]
+
+        second_doc = MagicMock()
+        second_doc.id = "second_doc_id"
+        second_doc.to_dict.return_value = {"field": "value"}
+        second_doc.reference.path = "test_collection/second_doc_id"
+        second_doc.reference.collections.return_value = (
+            first_doc.reference.collections.return_value
+        )
+        collection.stream.return_value = [first_doc, second_doc]
+
+        output = explorer.process_collection("test_collection")
+
+        assert explorer._subcol_cache["test_collection"] == (["subcollection"], 1)
+        assert any(
+            "### Collection: `test_collection/second_doc_id/subcollection`" in line
+            for line in output
+        )
+        # Whichever document listed first, its sibling reused the result
+        listings = (
+            first_doc.reference.collections.call_count
+            + second_doc.reference.collections.call_count
+        )
+        assert listings == 1
+
+    def test_share_subcollections_after_confirmations(self, explorer):
+        """Test that listing stops only once enough siblings agree."""
+        explorer.share_subcollections = True
+        explorer.SUBCOLLECTION_CONFIRMATIONS = 2
+        explorer.max_depth = 3
+        collection = explorer.db.collection("test_collection")
+
+        def make_doc(doc_id, subcol_ids):
+            doc = MagicMock()
+            doc.id = doc_id
+            doc.to_dict.return_value = {"field": "value"}
+            doc.reference.path = f"test_collection/{doc_id}"
+            subcols = []
+            for subcol_id in subcol_ids:
+                subcol = MagicMock()
+                subcol.id = subcol_id
+                subcols.append(subcol)
+            doc.reference.collections.return_value = subcols
+            return doc
+
+        # Whichever two documents list first agree, so the rest reuse them
+        docs = [make_doc(doc_id, ["orders", "reviews"]) for doc_id in "abcde"]
+        collection.stream.return_value = docs
+
+        output = explorer.process_collection("test_collection")
+
+        listings = sum(doc.reference.collections.call_count for doc in docs)
+        assert listings == 2
+        for doc in docs:
+            if doc.reference.collections.called:
+                doc.reference.collections.assert_called_once_with(
+                    page_size=explorer.SUBCOLLECTION_PAGE_SIZE
+                )
+        assert explorer._subcol_cache["test_collection"] == (["orders", "reviews"], 2)
+        assert any(
+            "### Collection: `test_collection/e/reviews`" in line for line in output
+        )
+
+    def test_identical_document_schemas_collapsed(self, explorer):
+        """Test that documents sharing a schema point back to the first one."""
+        explorer.max_depth = 1
+        collection = explorer.db.collection("test_collection")
+
+        def make_doc(doc_id, data):
+            doc = MagicMock()
+            doc.id = doc_id
+            doc.to_dict.return_value = data
+            return doc
+
+        collection.stream.return_value = [
+            make_doc("a", {"name": "Ada", "tags": {"x": 1}}),
+            make_doc("b", {"name": "Bob", "tags": {"x": 2}}),
+            make_doc("c", {"name": "Cy", "tags": {"x": "two"}}),
+        ]
+
+        output = explorer.process_collection("test_collection")
+
+        doc_b = output.index("#### Document: `b`")
+        assert output[doc_b + 1] == "*Same schema as `a`*"
+        doc_c = output.index("#### Document: `c`")
+        assert output[doc_c + 1] != "*Same schema as `a`*"
+
+        # Collapsed documents still count towards the fields analyzed
+        assert explorer.stats["fields"] == 9
+
+        # JSON export still carries the full field list for every document
+        schema = explorer._schema_tree["test_collection"]["documents"]
+        assert schema["b"]["fields"] == schema["a"]["fields"]
+
+    def test_document_fields_described_once(self, explorer):
+        """Test that each field is typed once while building and rendering a document."""
+        explorer.max_depth = 1
+        collection = explorer.db.collection("test_collection")
+        doc = MagicMock()
+        doc.id = "a"
+        doc.to_dict.return_value = {"name": "Ada", "tags": {"x": 1}}
+        collection.stream.return_value = [doc]
+
+        with patch.object(
+            explorer, "describe_type", wraps=explorer.describe_type
+        ) as describe:
+            explorer.process_collection("test_collection")
+
+        # name, tags and tags.x
+        assert describe.call_count == 3
+
+    def test_progress_updated_once_per_collection(self, explorer):
+        """Test that collection progress is reported once the sample is described."""
+        explorer.max_depth = 1
+        explorer._progress = MagicMock()
+        explorer._progress.add_task.return_value = 7
+        collection = explorer.db.collection("test_collection")
+        first_doc = collection.stream.return_value[0]
+        collection.stream.return_value = [first_doc, first_doc, first_doc]
+
+        explorer.process_collection("test_collection")
+
+        explorer._progress.update.assert_called_once_with(7, completed=3)
@@ -4,26 +4,17 @@
 import os
 import pytest
 import json
-import tempfile
-from unittest.mock import patch
 from pathlib import Path
-
-import sys
-
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
-from main import FirestoreSchemaExplorer
+from unittest.mock import MagicMock, patch
 
 
 class TestExportFunctionality:
     """Test the schema export functionality."""
 
     @pytest.fixture
-    def explorer(self, mock_firestore_client):
+    def explorer(self, make_explorer, mock_firestore_client):
         """Create a FirestoreSchemaExplorer instance for testing."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                return FirestoreSchemaExplorer()
+        return make_explorer(mock_firestore_client)
 
     @pytest.fixture
     def sample_output(self):
@@ -55,86 +46,137 @@ Project: `test-project`
 - Fields analyzed: 9
 - Duration: 0.25 seconds"""
 
-    def test_markdown_export(self, explorer, sample_output):
+    def test_markdown_export(self, explorer, sample_output, tmp_path):
         """Test exporting to markdown format."""
-        # Create a temporary file path
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".md") as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            # Export the sample output
-            result_path = explorer.export_to_file(sample_output, temp_path, format="md")
+        temp_path = str(tmp_path / "out.md")
 
-            # Verify the file was created and has the correct content
-            assert os.path.exists(temp_path)
-            with open(temp_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                assert content == sample_output
+        # Export the sample output
+        result_path = explorer.export_to_file(sample_output, temp_path, format="md")
 
-            # Verify the returned path
-            assert result_path == temp_path
+        # Verify the file was created and has the correct content
+        assert os.path.exists(temp_path)
+        content = Path(temp_path).read_text(encoding="utf-8")
+        assert content == sample_output
 
-        finally:
-            # Clean up
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        # Verify the returned path
+        assert result_path == temp_path
 
-    def test_json_export(self, explorer, sample_output):
+    def test_json_export(self, explorer, sample_output, tmp_path):
         """Test exporting to JSON format."""
-        # Create a temporary file path
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            # Export the sample output
-            result_path = explorer.export_to_file(
-                sample_output, temp_path, format="json"
-            )
-
-            # Verify the file was created
-            assert os.path.exists(temp_path)
-
-            # Verify the JSON structure
-            with open(temp_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-                # Check expected structure
-                assert "users" in data
-                assert "posts" in data
-                assert "documents" in data["users"]
-                assert "user1" in data["users"]["documents"]
-                assert "fields" in data["users"]["documents"]["user1"]
-
-                # Check some field content
-                user_fields = data["users"]["documents"]["user1"]["fields"]
-                assert any(
-                    field["name"] == "name" and field["type"] == "string"
-                    for field in user_fields
-                )
-
-            # Verify the returned path
-            assert result_path == temp_path
-
-        finally:
-            # Clean up
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-
-    def test_create_missing_directories(self, explorer, sample_output):
+        # Explore a small collection so there is structured schema to export
+        user = MagicMock()
+        user.id = "user1"
+        user.to_dict.return_value = {
+            "name": "Ada",
+            "age": 36,
+            "profile": {"bio": "Mathematician"},
+        }
+        user.reference.collections.return_value = []
+        users = MagicMock()
+        users.limit.return_value.stream.return_value = [user]
+        explorer.db.collection.return_value = users
+        explorer.process_collection("users")
+
+        temp_path = str(tmp_path / "out.json")
+
+        # Export the sample output
+        result_path = explorer.export_to_file(sample_output, temp_path, format="json")
+
+        # Verify the file was created
+        assert os.path.exists(temp_path)
+
+        # Verify the JSON structure
+        data = json.loads(Path(temp_path).read_bytes())
+
+        # Check expected structure
+        assert "users" in data
+        assert "documents" in data["users"]
+        assert "user1" in data["users"]["documents"]
+        assert "fields" in data["users"]["documents"]["user1"]
+
+        # Check some field content
+        user_fields = data["users"]["documents"]["user1"]["fields"]
+        fields_by_name = {field["name"]: field for field in user_fields}
+        assert fields_by_name["name"]["type"] == "string"
+
+        # Nested maps keep their fields grouped under the parent
+        profile = fields_by_name["profile"]
+        assert profile["fields"] == [{"name": "bio", "type": "string"}]
+
+        # Verify the returned path
+        assert result_path == temp_path
+
+    def test_json_export_requires_exploration(self, explorer, sample_output, tmp_path):
+        """Test that JSON export refuses to run before anything was explored."""
+        temp_path = tmp_path / "out.json"
+
+        with pytest.raises(ValueError, match="explored"):
+            explorer.export_to_file(sample_output, str(temp_path), format="json")
+
+        assert not temp_path.exists()
+
+    def test_json_export_uses_orjson(self, explorer, tmp_path):
+        """Test that JSON export writes orjson bytes when it is installed."""
+        temp_path = str(tmp_path / "out.json")
+        explorer._schema_tree = {"users": {"documents": {}}}
+        fake_orjson = MagicMock()
+        fake_orjson.dumps.return_value = b'{"users": {"documents": {}}}'
+
+        with patch("main.orjson", fake_orjson):
+            explorer.export_to_file("", temp_path, format="json")
+
+        fake_orjson.dumps.assert_called_once_with(
+            {"users": {"documents": {}}}, option=fake_orjson.OPT_INDENT_2
+        )
+        assert json.loads(Path(temp_path).read_bytes()) == {"users": {"documents": {}}}
+
+    def test_json_export_without_orjson_keeps_unicode(self, explorer, tmp_path):
+        """Test that the stdlib JSON fallback writes non-ASCII text like orjson."""
+        temp_path = tmp_path / "out.json"
+        explorer._schema_tree = {"café": {"documents": {}}}
+
+        with patch("main.orjson", None):
+            explorer.export_to_file("", str(temp_path), format="json")
+
+        assert "café" in temp_path.read_text(encoding="utf-8")
+
+    def test_markdown_export_from_lines(self, explorer, sample_output, tmp_path):
+        """Test exporting markdown incrementally from an iterable of lines."""
+        temp_path = str(tmp_path / "out.md")
+
+        explorer.export_to_file(iter(sample_output.split("\n")), temp_path)
+
+        # Byte-for-byte the same as exporting the joined string
+        assert Path(temp_path).read_bytes() == sample_output.encode("utf-8")
+
+    def test_failed_export_keeps_existing_file(self, explorer, tmp_path):
+        """Test that an export failing part-way leaves the old file intact."""
+        output_path = tmp_path / "out.md"
+        output_path.write_text("previous schema", encoding="utf-8")
+
+        def failing_lines():
+            yield "# partial"
+            raise RuntimeError("Exploration failed")
+
+        with pytest.raises(RuntimeError):
+            explorer.export_to_file(failing_lines(), str(output_path))
+
+        assert output_path.read_text(encoding="utf-8") == "previous schema"
+        assert [p.name for p in tmp_path.iterdir()] == ["out.md"]
+
+    def test_create_missing_directories(self, explorer, sample_output, tmp_path):
         """Test creating missing parent directories when exporting."""
-        # Create a temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Create a path with nested directories
-            nested_path = os.path.join(temp_dir, "nested", "dirs", "output.md")
+        # Create a path with nested directories
+        nested_path = str(tmp_path / "nested" / "dirs" / "output.md")
 
-            # Export the sample output
-            result_path = explorer.export_to_file(sample_output, nested_path)
+        # Export the sample output
+        result_path = explorer.export_to_file(sample_output, nested_path)
 
-            # Verify the file was created with the nested directories
-            assert os.path.exists(nested_path)
+        # Verify the file was created with the nested directories
+        assert os.path.exists(nested_path)
 
-            # Verify the returned path
-            assert result_path == nested_path
+        # Verify the returned path
+        assert result_path == nested_path
 
     def test_export_error_handling(self, explorer, sample_output):
         """Test error handling during export."""
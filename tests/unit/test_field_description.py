@@ -2,25 +2,15 @@
 # ABOUTME: Validates correct description of document fields and nested structures.
 
 import pytest
-from unittest.mock import patch
-from pathlib import Path
-
-import sys
-
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
-from main import FirestoreSchemaExplorer
 
 
 class TestFieldDescription:
     """Test the field description functionality."""
 
     @pytest.fixture
-    def explorer(self, mock_firestore_client):
+    def explorer(self, make_explorer, mock_firestore_client):
         """Create a FirestoreSchemaExplorer instance for testing."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                return FirestoreSchemaExplorer()
+        return make_explorer(mock_firestore_client)
 
     def test_simple_fields(self, explorer, mock_document_data):
         """Test description of simple fields."""
@@ -74,6 +64,20 @@ class TestFieldDescription:
         # Check stats
         assert explorer.stats["fields"] == 4
 
+    def test_fields_sorted(self, explorer):
+        """Test that fields are listed alphabetically at every level."""
+        data = {"zeta": 1, "alpha": {"mu": True, "beta": "b"}}
+
+        output_lines = []
+        explorer.describe_fields(data, 0, output_lines)
+
+        assert output_lines == [
+            "- `alpha` (map)",
+            "  - `beta` (string)",
+            "  - `mu` (boolean)",
+            "- `zeta` (integer)",
+        ]
+
     def test_empty_data(self, explorer):
         """Test description of empty document."""
         empty_data = {}
@@ -83,3 +87,29 @@ class TestFieldDescription:
 
         assert len(output_lines) == 0
         assert explorer.stats["fields"] == 0
+
+    def test_structured_fields(self, explorer):
+        """Test collecting structured field entries alongside markdown lines."""
+        data = {"name": "value", "address": {"city": "Paris"}}
+
+        output_lines = []
+        fields = []
+        explorer.describe_fields(data, 0, output_lines, fields)
+
+        assert fields == [
+            {
+                "name": "address",
+                "type": "map",
+                "fields": [{"name": "city", "type": "string"}],
+            },
+            {"name": "name", "type": "string"},
+        ]
+        assert len(output_lines) == 3
+
+    def test_indent(self, explorer):
+        """Test indentation from the precomputed table and beyond it."""
+        assert explorer.indent(0) == ""
+        assert explorer.indent(3) == "      "
+
+        deep = len(explorer._indents) + 2
+        assert explorer.indent(deep) == "  " * deep
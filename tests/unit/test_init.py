@@ -3,75 +3,95 @@
 
 import os
 import pytest
+from contextlib import ExitStack
+from types import SimpleNamespace
 from unittest.mock import patch
 from pathlib import Path
 
-import sys
+from main import FirestoreSchemaExplorer
 
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from main import FirestoreSchemaExplorer
+@pytest.fixture
+def patched_client(mock_firestore_client):
+    """Patch the Firestore client class and .env loading for the explorer."""
+    with ExitStack() as stack:
+        yield SimpleNamespace(
+            client_class=stack.enter_context(
+                patch("main.firestore.Client", return_value=mock_firestore_client)
+            ),
+            load_dotenv=stack.enter_context(patch("main.load_dotenv")),
+        )
 
 
 class TestFirestoreSchemaExplorerInit:
     """Test the FirestoreSchemaExplorer class initialization."""
 
-    def test_default_init(self, mock_firestore_client):
+    def test_default_init(self, patched_client, mock_firestore_client):
         """Test initialization with default parameters."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer()
-
-                assert explorer.max_docs == 5
-                assert explorer.max_depth == 5
-                assert explorer.include_stats is True
-                assert explorer.sample_arrays is True
-                assert explorer.array_sample_size == 3
-                assert explorer.db is mock_firestore_client
-                assert explorer.stats["collections"] == 0
-                assert explorer.stats["documents"] == 0
-                assert explorer.stats["fields"] == 0
-                assert "start_time" in explorer.stats
-
-    def test_custom_parameters(self, mock_firestore_client):
+        explorer = FirestoreSchemaExplorer()
+
+        assert explorer.max_docs == 5
+        assert explorer.max_depth == 5
+        assert explorer.include_stats is True
+        assert explorer.sample_arrays is True
+        assert explorer.array_sample_size == 3
+        assert explorer.max_concurrency == 40
+        assert explorer.db is mock_firestore_client
+        assert explorer.stats["collections"] == 0
+        assert explorer.stats["documents"] == 0
+        assert explorer.stats["fields"] == 0
+        assert "start_time" in explorer.stats
+
+    def test_custom_parameters(self, patched_client, mock_firestore_client):
         """Test initialization with custom parameters."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(
-                    project_id="test-project",
-                    max_docs=10,
-                    max_depth=3,
-                    include_stats=False,
-                    sample_arrays=False,
-                    array_sample_size=5,
+        explorer = FirestoreSchemaExplorer(
+            project_id="test-project",
+            max_docs=10,
+            max_depth=3,
+            include_stats=False,
+            sample_arrays=False,
+            array_sample_size=5,
+            max_concurrency=8,
+        )
+
+        assert explorer.max_docs == 10
+        assert explorer.max_depth == 3
+        assert explorer.include_stats is False
+        assert explorer.sample_arrays is False
+        assert explorer.array_sample_size == 5
+        assert explorer.max_concurrency == 8
+        assert explorer.db is mock_firestore_client
+
+    def test_invalid_max_concurrency(self, patched_client):
+        """Test that a non-positive concurrency limit is rejected up front."""
+        with pytest.raises(ValueError, match="max_concurrency must be at least 1"):
+            FirestoreSchemaExplorer(max_concurrency=0)
+
+    def test_credentials_path(self, patched_client):
+        """Test initialization with credentials path."""
+        mock_credentials = object()
+        with ExitStack() as stack:
+            stack.enter_context(patch("main.Path.is_file", return_value=True))
+            mock_load = stack.enter_context(
+                patch(
+                    "main.load_credentials_from_file",
+                    return_value=(mock_credentials, "sa-project"),
                 )
+            )
+            stack.enter_context(patch.dict(os.environ, {}, clear=True))
 
-                assert explorer.max_docs == 10
-                assert explorer.max_depth == 3
-                assert explorer.include_stats is False
-                assert explorer.sample_arrays is False
-                assert explorer.array_sample_size == 5
-                assert explorer.db is mock_firestore_client
+            FirestoreSchemaExplorer(credentials_path="/fake/path/credentials.json")
 
-    def test_credentials_path(self, mock_firestore_client):
-        """Test initialization with credentials path."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                with patch("main.Path.is_file", return_value=True):
-                    with patch("main.os") as mock_os:
-                        FirestoreSchemaExplorer(
-                            credentials_path="/fake/path/credentials.json"
-                        )
-
-                        # Check that the environment variable was set
-                        mock_os.environ.__setitem__.assert_called_with(
-                            "GOOGLE_APPLICATION_CREDENTIALS",
-                            str(
-                                Path("/fake/path/credentials.json")
-                                .expanduser()
-                                .resolve()
-                            ),
-                        )
+            # Credentials go straight to the client
+            mock_load.assert_called_once_with(
+                str(Path("/fake/path/credentials.json").expanduser().resolve())
+            )
+            patched_client.client_class.assert_called_once_with(
+                credentials=mock_credentials, project="sa-project"
+            )
+
+            # The environment is left untouched
+            assert "GOOGLE_APPLICATION_CREDENTIALS" not in os.environ
 
     def test_missing_credentials_file(self):
         """Test error handling when credentials file doesn't exist."""
@@ -95,15 +115,49 @@ class TestFirestoreSchemaExplorerInit:
 
                 assert "Connection error" in str(excinfo.value)
 
-    def test_use_env_credentials(self, mock_firestore_client):
+    def test_use_env_credentials(self, patched_client, mock_firestore_client):
         """Test using credentials from environment variable."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                with patch("main.Path.is_file", return_value=True):
-                    with patch.dict(
-                        os.environ,
-                        {"GOOGLE_APPLICATION_CREDENTIALS": "/env/path/creds.json"},
-                    ):
-                        explorer = FirestoreSchemaExplorer()
-                        # Should use existing environment variable, not overwrite it
-                        assert explorer.db is mock_firestore_client
+        mock_credentials = object()
+        with ExitStack() as stack:
+            stack.enter_context(patch("main.Path.is_file", return_value=True))
+            mock_load = stack.enter_context(
+                patch(
+                    "main.load_credentials_from_file",
+                    return_value=(mock_credentials, None),
+                )
+            )
+            stack.enter_context(
+                patch.dict(os.environ, {"GOOGLE_APPLICATION_CREDENTIALS": "~/sa.json"})
+            )
+
+            explorer = FirestoreSchemaExplorer()
+
+            # The env path is expanded and loaded just like an explicit one
+            mock_load.assert_called_once_with(
+                str(Path("~/sa.json").expanduser().resolve())
+            )
+            patched_client.client_class.assert_called_once_with(
+                credentials=mock_credentials
+            )
+            assert explorer.db is mock_firestore_client
+
+            # Should use existing environment variable, not overwrite it
+            assert os.environ["GOOGLE_APPLICATION_CREDENTIALS"] == "~/sa.json"
+
+    def test_dotenv_loaded_once(self, patched_client):
+        """Test that the .env file is only loaded once per process."""
+        with patch("main._DOTENV_LOADED", False):
+            FirestoreSchemaExplorer()
+            FirestoreSchemaExplorer()
+
+        patched_client.load_dotenv.assert_called_once()
+
+    def test_context_manager_shuts_down_pools(self, patched_client):
+        """Test that leaving the context shuts down the worker pools."""
+        with FirestoreSchemaExplorer() as explorer:
+            pass
+
+        with pytest.raises(RuntimeError):
+            explorer._executor.submit(print)
+        with pytest.raises(RuntimeError):
+            explorer._rpc_executor.submit(print)
@@ -2,24 +2,20 @@
 # ABOUTME: Validates that operations time out gracefully rather than hanging.
 
 import time
+import threading
+import pytest
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
-from main import FirestoreSchemaExplorer, TimeoutError
+from main import TimeoutError
 
 
 class TestTimeoutHandling:
     """Test timeout handling features."""
 
-    def test_run_with_timeout_success(self):
+    def test_run_with_timeout_success(self, make_explorer):
         """Test that fast operations complete successfully."""
-        with patch("main.firestore.Client"):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(timeout=5)
+        explorer = make_explorer(MagicMock(), timeout=5)
 
         # Define a fast operation
         def fast_operation():
@@ -32,30 +28,82 @@ class TestTimeoutHandling:
         assert error is None
         assert result == "success"
 
-    def test_run_with_timeout_timeout(self):
+    def test_run_with_timeout_timeout(self, make_explorer):
         """Test that slow operations time out."""
-        with patch("main.firestore.Client"):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(timeout=1)
+        explorer = make_explorer(MagicMock(), timeout=0.1)
+
+        # Define a slow operation that hangs until the test releases it
+        release = threading.Event()
 
-        # Define a slow operation that would hang
         def slow_operation():
-            time.sleep(10)  # This would normally hang
+            release.wait()
             return "success"
 
-        # Should time out
-        result, timed_out, error = explorer._run_with_timeout(slow_operation)
+        # Should time out without waiting for the operation to finish
+        start = time.time()
+        try:
+            result, timed_out, error = explorer._run_with_timeout(slow_operation)
+        finally:
+            release.set()
 
+        assert time.time() - start < 5
         assert timed_out
         assert isinstance(error, TimeoutError)
         assert result is None
         assert explorer.stats["timeouts"] == 1
 
-    def test_run_with_timeout_error(self):
+    def test_run_with_timeout_counts_slot_wait(self, make_explorer):
+        """Test that waiting for an RPC slot uses up part of the timeout."""
+        explorer = make_explorer(MagicMock(), timeout=0.5, max_concurrency=1)
+
+        # Hold the only slot for most of the timeout
+        explorer._rpc_slots.acquire()
+        releaser = threading.Timer(0.4, explorer._rpc_slots.release)
+        releaser.start()
+        release = threading.Event()
+
+        start = time.time()
+        try:
+            result, timed_out, error = explorer._run_with_timeout(release.wait)
+        finally:
+            release.set()
+            releaser.join()
+
+        # The call only gets what is left of the timeout, not a fresh one
+        assert time.time() - start < 0.75
+        assert timed_out
+        assert result is None
+
+    def test_run_with_timeout_after_close(self, make_explorer):
+        """Test that a closed explorer reports an error and keeps its RPC slot."""
+        explorer = make_explorer(MagicMock(), timeout=5, max_concurrency=1)
+        explorer.close()
+
+        for _ in range(2):
+            result, timed_out, error = explorer._run_with_timeout(lambda: "success")
+
+            assert result is None
+            assert not timed_out
+            assert isinstance(error, RuntimeError)
+        assert explorer.stats["timeouts"] == 0
+        assert explorer.stats["errors"] == 2
+
+    def test_run_with_timeout_reuses_rpc_pool(self, make_explorer):
+        """Test that operations run on the explorer's shared RPC pool."""
+        explorer = make_explorer(MagicMock(), timeout=5, max_concurrency=2)
+
+        with patch("main.concurrent.futures.ThreadPoolExecutor") as pool_class:
+            names = [
+                explorer._run_with_timeout(lambda: threading.current_thread().name)[0]
+                for _ in range(3)
+            ]
+
+        pool_class.assert_not_called()
+        assert all(name.startswith("firestore-rpc") for name in names)
+
+    def test_run_with_timeout_error(self, make_explorer):
         """Test that errors are properly propagated."""
-        with patch("main.firestore.Client"):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(timeout=5)
+        explorer = make_explorer(MagicMock(), timeout=5)
 
         # Define an operation that raises an error
         def error_operation():
@@ -70,18 +118,17 @@ class TestTimeoutHandling:
         assert result is None
         assert explorer.stats["errors"] == 1
 
-    def test_safe_stream_collection(self):
+    def test_safe_stream_collection(self, make_explorer):
         """Test safe collection streaming with timeout handling."""
-        with patch("main.firestore.Client"):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(timeout=1)
+        explorer = make_explorer(MagicMock(), timeout=0.1)
 
-        # Create a mock collection that would hang when streamed
+        # Create a mock collection that hangs when streamed until released
         mock_collection = MagicMock()
         mock_collection.id = "hanging_collection"
+        release = threading.Event()
 
         def hanging_stream():
-            time.sleep(10)  # This would normally hang
+            release.wait()
             return []
 
         mock_query = MagicMock()
@@ -89,16 +136,18 @@ class TestTimeoutHandling:
         mock_collection.limit.return_value = mock_query
 
         # Should return empty list and record timeout
-        result = explorer._safe_stream_collection(mock_collection, 10)
+        try:
+            result = explorer._safe_stream_collection(mock_collection, 10)
+        finally:
+            release.set()
 
         assert result == []
         assert explorer.stats["timeouts"] == 1
 
-    def test_explore_database_with_timeout(self):
+    @pytest.mark.timeout(2)
+    def test_explore_database_with_timeout(self, make_explorer):
         """Test that database exploration handles timeouts gracefully."""
-        with patch("main.firestore.Client"):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(timeout=1)
+        explorer = make_explorer(MagicMock(), timeout=1)
 
         # Create a mock db that times out when listing collections
         mock_db = MagicMock()
@@ -111,34 +160,26 @@ class TestTimeoutHandling:
         explorer.db = mock_db
 
         # Should not hang and should include timeout message
-        start_time = time.time()
         result = explorer.explore_database()
-        duration = time.time() - start_time
 
-        # Should complete in around timeout value (1 second) plus some overhead
-        assert duration < 5
         assert "*Error listing collections: Simulated timeout*" in result
         assert explorer.stats["errors"] >= 1
 
-    def test_subcollection_timeout(self):
+    @pytest.mark.timeout(2)
+    def test_subcollection_timeout(self, make_explorer):
         """Test handling of subcollection retrieval timeouts."""
-        with patch("main.firestore.Client"):
-            with patch("main.load_dotenv"):
-                explorer = FirestoreSchemaExplorer(timeout=1)
-
-        # Mock document with a reference that times out when getting subcollections
-        mock_doc = MagicMock()
-        mock_doc.id = "test_doc"
-        mock_doc.to_dict.return_value = {"field": "value"}
-
-        mock_ref = MagicMock()
+        explorer = make_explorer(MagicMock(), timeout=1)
 
-        def hanging_subcollections():
+        # Document with a reference that times out when getting subcollections
+        def hanging_subcollections(**kwargs):
             # Instead of actually sleeping, raise TimeoutError to simulate
             raise TimeoutError("Simulated timeout")
 
-        mock_ref.collections.side_effect = hanging_subcollections
-        mock_doc.reference = mock_ref
+        mock_doc = SimpleNamespace(
+            id="test_doc",
+            to_dict=lambda: {"field": "value"},
+            reference=SimpleNamespace(collections=hanging_subcollections),
+        )
 
         # Mock collection that returns our test document
         mock_collection = MagicMock()
@@ -152,14 +193,51 @@ class TestTimeoutHandling:
         explorer.db = mock_db
 
         # Process the collection - should not hang on subcollections
-        start_time = time.time()
         result = explorer.process_collection("test_collection")
-        duration = time.time() - start_time
 
-        # Should complete in around timeout value plus some overhead
-        assert duration < 5
         assert any(
             "*Error fetching subcollections: Simulated timeout*" in line
             for line in result
         )
         assert explorer.stats["errors"] >= 1
+
+    def test_safe_stream_collection_pages(self, make_explorer):
+        """Test that large samples are fetched with cursor pagination."""
+        explorer = make_explorer(MagicMock(), timeout=5)
+
+        explorer.SAMPLE_PAGE_SIZE = 2
+        first_page = [MagicMock(), MagicMock()]
+        second_page = [MagicMock()]
+
+        mock_collection = MagicMock()
+        query = mock_collection.order_by.return_value
+        query.limit.return_value.stream.return_value = first_page
+        next_query = query.limit.return_value.start_after.return_value
+        next_query.stream.return_value = second_page
+
+        result = explorer._safe_stream_collection(mock_collection, 5)
+
+        assert result == first_page + second_page
+        mock_collection.order_by.assert_called_once_with("__name__")
+        query.limit.return_value.start_after.assert_called_once_with(first_page[-1])
+        # Both full pages reuse one query, and the short second page ends
+        # pagination before a final partial page is needed
+        query.limit.assert_called_once_with(2)
+
+    def test_safe_stream_collection_pages_keep_partial_results(self, make_explorer):
+        """Test that a timed-out page keeps the documents already fetched."""
+        explorer = make_explorer(MagicMock(), timeout=5)
+
+        explorer.SAMPLE_PAGE_SIZE = 2
+        first_page = [MagicMock(), MagicMock()]
+
+        mock_collection = MagicMock()
+        query = mock_collection.order_by.return_value
+        query.limit.return_value.stream.return_value = first_page
+        next_query = query.limit.return_value.start_after.return_value
+        next_query.stream.side_effect = TimeoutError("Simulated timeout")
+
+        result = explorer._safe_stream_collection(mock_collection, 5)
+
+        assert result == first_page
+        assert explorer.stats["errors"] == 1
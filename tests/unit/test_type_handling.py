@@ -3,57 +3,64 @@
 
 import pytest
 from datetime import datetime
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
-from pathlib import Path
 
-import sys
-
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
-from main import FirestoreSchemaExplorer
 from google.cloud import firestore
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
 
 
 class TestTypeDescriptions:
     """Test the type description functionality."""
 
     @pytest.fixture
-    def explorer(self, mock_firestore_client):
+    def explorer(self, make_explorer, mock_firestore_client):
         """Create a FirestoreSchemaExplorer instance for testing."""
-        with patch("main.firestore.Client", return_value=mock_firestore_client):
-            with patch("main.load_dotenv"):
-                return FirestoreSchemaExplorer()
-
-    def test_basic_types(self, explorer):
+        return make_explorer(mock_firestore_client)
+
+    @pytest.mark.parametrize(
+        "value,expected",
+        [
+            ("test string", "string"),
+            (42, "integer"),
+            (3.14, "float"),
+            (True, "boolean"),
+            (None, "null"),
+        ],
+    )
+    def test_basic_types(self, explorer, value, expected):
         """Test description of basic data types."""
-        assert explorer.describe_type("test string") == "string"
-        assert explorer.describe_type(42) == "integer"
-        assert explorer.describe_type(3.14) == "float"
-        assert explorer.describe_type(True) == "boolean"
-        assert explorer.describe_type(None) == "null"
-
-    def test_collection_types(self, explorer):
+        assert explorer.describe_type(value) == expected
+
+    @pytest.mark.parametrize(
+        "value,sample_arrays,expected",
+        [
+            pytest.param({"key": "value"}, True, "map", id="map"),
+            pytest.param([], True, "array<?>", id="empty-array"),
+            # With sampling enabled (default)
+            pytest.param([1, 2, 3], True, "array<integer>", id="sampled-uniform"),
+            pytest.param(
+                [1, "string", True],
+                True,
+                "array<mixed:boolean,integer,string>",
+                id="sampled-mixed",
+            ),
+            # With sampling disabled
+            pytest.param([1, 2, 3], False, "array<integer>", id="unsampled-uniform"),
+            pytest.param(
+                [1, "string", True], False, "array<integer>", id="unsampled-mixed"
+            ),
+        ],
+    )
+    def test_collection_types(self, explorer, value, sample_arrays, expected):
         """Test description of collection types."""
-        assert explorer.describe_type({"key": "value"}) == "map"
-        assert explorer.describe_type([]) == "array<?>"
-
-        # With sampling enabled (default)
-        assert explorer.describe_type([1, 2, 3]) == "array<integer>"
-        assert (
-            explorer.describe_type([1, "string", True])
-            == "array<mixed:boolean,integer,string>"
-        )
-
-        # With sampling disabled
-        explorer.sample_arrays = False
-        assert explorer.describe_type([1, 2, 3]) == "array<integer>"
-        assert explorer.describe_type([1, "string", True]) == "array<integer>"
+        explorer.sample_arrays = sample_arrays
+        assert explorer.describe_type(value) == expected
 
     def test_timestamp(self, explorer):
         """Test timestamp detection."""
-        # Create a mock timestamp
-        mock_timestamp = MagicMock()
-        mock_timestamp.timestamp = datetime.now()
+        # Create a value that only looks like a timestamp
+        mock_timestamp = SimpleNamespace(timestamp=datetime.now())
 
         assert explorer.describe_type(mock_timestamp) == "timestamp"
         assert explorer.describe_type(datetime.now()) == "timestamp"
@@ -104,3 +111,71 @@ class TestTypeDescriptions:
             explorer.describe_type(large_mixed_array)
             == "array<mixed:boolean,integer,string>"
         )
+
+    def test_type_cache(self, explorer):
+        """Test that value-independent descriptions are memoized."""
+        assert explorer.describe_type("first") == "string"
+        assert explorer.describe_type([1, 2]) == "array<integer>"
+
+        assert explorer._type_cache[str] == "string"
+        assert explorer._type_cache[(list, int, int)] == "array<integer>"
+
+        # Cached answers are reused for different values of the same shape
+        assert explorer.describe_type("second") == "string"
+        assert explorer.describe_type([3, 4]) == "array<integer>"
+
+    def test_type_cache_skips_value_dependent_types(self, explorer):
+        """Test that references and nested arrays are not memoized by type."""
+        first_ref = MagicMock(spec=firestore.DocumentReference)
+        first_ref.path = "users/alice"
+        second_ref = MagicMock(spec=firestore.DocumentReference)
+        second_ref.path = "users/bob"
+
+        assert explorer.describe_type(first_ref) == "reference→users/alice"
+        assert explorer.describe_type(second_ref) == "reference→users/bob"
+
+        # Nested arrays share an outer key but differ in their element types
+        assert explorer.describe_type([[1]]) == "array<array<integer>>"
+        assert explorer.describe_type([["a"]]) == "array<array<string>>"
+
+    def test_firestore_value_types(self, explorer):
+        """Test values of the concrete types returned by the Firestore SDK."""
+        timestamp = DatetimeWithNanoseconds(2024, 1, 2, 3, 4, 5, nanosecond=6)
+        assert explorer.describe_type(timestamp) == "timestamp"
+
+        ref = firestore.DocumentReference("users", "alice", client=MagicMock())
+        assert explorer.describe_type(ref) == "reference→users/alice"
+
+    def test_mixed_array_lists_every_sampled_type(self, explorer):
+        """Test that a mixed array still reports types found after the first mismatch."""
+        explorer.array_sample_size = 5
+        assert (
+            explorer.describe_type([1, 1, "a", 2.5, "b"])
+            == "array<mixed:float,integer,string>"
+        )
+
+    def test_array_describes_each_element_type_once(self, explorer):
+        """Test that sampled elements of an already-seen type are not re-described."""
+        explorer.array_sample_size = 5
+        with patch.object(
+            explorer, "describe_type", wraps=explorer.describe_type
+        ) as describe:
+            assert explorer._describe_array([1, 2, 3, 4, 5]) == "array<integer>"
+
+        assert describe.call_count == 1
+
+    def test_subclasses_of_known_types(self, explorer):
+        """Test that subclasses of Firestore value types are recognized by class."""
+
+        class LocalTimestamp(datetime):
+            pass
+
+        class LocalReference(firestore.DocumentReference):
+            pass
+
+        assert explorer.describe_type(LocalTimestamp(2024, 1, 2)) == "timestamp"
+
+        ref = LocalReference("users", "alice", client=MagicMock())
+        assert explorer.describe_type(ref) == "reference→users/alice"
+        # Later references of the same class skip the isinstance checks
+        assert LocalReference in explorer._describe_dispatch